@@ -160,7 +160,7 @@ except Exception:
 
 # Debug modes are names that influence the exposure of internal details to
 # the user, either through additional derivatives or increased verbosity
-DEBUG_MODES = ""
+DEBUG_MODES = ("construction",)
 
 
 class _Config:
@@ -264,6 +264,8 @@ class nipype(_Config):
         "raise_insufficient": False,
     }
     """Settings for NiPype's execution plugin."""
+    poll_sleep_duration = 0.1
+    """Seconds the distributed plugins sleep between scheduling polls."""
     resource_monitor = False
     """Enable resource monitor."""
     stop_on_first_crash = True
@@ -277,6 +279,10 @@ class nipype(_Config):
             "plugin_args": cls.plugin_args,
         }
         if cls.plugin in ("MultiProc", "LegacyMultiProc"):
+            if int(cls.nprocs) < 2:  # type: ignore[arg-type]
+                # a single worker gains nothing from the process pool
+                out["plugin"] = "Linear"
+                return out
             out["plugin_args"]["n_procs"] = int(cls.nprocs)  # type: ignore[index, arg-type]
             if cls.memory_gb:
                 out["plugin_args"]["memory_gb"] = float(cls.memory_gb)  # type: ignore[unreachable]
@@ -309,6 +315,9 @@ class nipype(_Config):
                     "get_linked_libs": cls.get_linked_libs,
                     "stop_on_first_crash": cls.stop_on_first_crash,
                     "check_version": False,  # disable future telemetry
+                    # the distributed plugins read the scheduler poll
+                    # interval from nipype's execution config
+                    "poll_sleep_duration": cls.poll_sleep_duration,
                 }
             }
         )
@@ -483,6 +492,8 @@ class workflow(_Config):
     """DEPRECATED: see --b1-biascorrect-stage."""
     eddy_config = "--fwhm=0 --flm='quadratic' --repol"
     """Configuration for running Eddy."""
+    eddy_qc_reports = True
+    """Collect eddy's full QC outputs (~30 files per subject) and plot them."""
     hmc_model = "eddy"
     """Model used to generate target images for hmc."""
     b0_threshold = 100
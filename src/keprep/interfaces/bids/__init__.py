@@ -5,6 +5,7 @@ from keprep.interfaces.bids.bids import (  # noqa: F401
 from keprep.interfaces.bids.utils import (  # noqa: F401
     collect_data,
     get_fieldmap,
+    get_fieldmaps,
     write_bidsignore,
     write_derivative_description,
 )
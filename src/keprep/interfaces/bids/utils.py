@@ -1,11 +1,18 @@
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
 
 from bids import BIDSLayout
 from bids.layout import Query, parse_file_entities
 
 
+@lru_cache(maxsize=None)
+def _parse_file_entities_cached(fname: str) -> dict:
+    """Parse BIDS entities out of a filename, caching repeated lookups."""
+    return parse_file_entities(fname)
+
+
 def collect_data(
     bids_dir,
     participant_label,
@@ -129,14 +136,14 @@ def get_fieldmap(dwi_file: str | Path, subject_data: dict) -> str | None:
     str
         path to the fieldmap file
     """
-    dwi_entities = parse_file_entities(dwi_file)
+    dwi_entities = _parse_file_entities_cached(str(dwi_file))
     dwi_dir = dwi_entities["direction"]
     fmap_dir = dwi_dir[::-1]  # reverse the direction
     avaliable_fmaps = subject_data.get("fmap")
     if not avaliable_fmaps:
         raise FileNotFoundError(f"No fieldmap found for <{dwi_file}>")
     for fmap in avaliable_fmaps:
-        fmap_entities = parse_file_entities(fmap)
+        fmap_entities = _parse_file_entities_cached(str(fmap))
         if (
             fmap_entities["direction"] == fmap_dir
             and fmap_entities["session"] == dwi_entities["session"]
@@ -145,6 +152,44 @@ def get_fieldmap(dwi_file: str | Path, subject_data: dict) -> str | None:
     return None
 
 
+def get_fieldmaps(dwi_files: list, subject_data: dict) -> dict:
+    """
+    Resolve the fieldmap for every DWI file in a single pass.
+
+    Builds a (direction, session) index over the available fieldmaps
+    once, instead of re-scanning them for each DWI file as
+    :func:`get_fieldmap` does.
+
+    Parameters
+    ----------
+    dwi_files : list
+        paths to DWI files
+    subject_data : dict
+        subject data
+
+    Returns
+    -------
+    dict
+        mapping of DWI file to its fieldmap (or None if unmatched)
+    """
+    avaliable_fmaps = subject_data.get("fmap")
+    if not avaliable_fmaps:
+        raise FileNotFoundError(f"No fieldmap found for <{dwi_files}>")
+    fmap_index: dict = {}
+    for fmap in avaliable_fmaps:
+        fmap_entities = _parse_file_entities_cached(str(fmap))
+        fmap_index.setdefault(
+            (fmap_entities["direction"], fmap_entities["session"]), fmap
+        )
+    fieldmaps = {}
+    for dwi_file in dwi_files:
+        dwi_entities = _parse_file_entities_cached(str(dwi_file))
+        fieldmaps[dwi_file] = fmap_index.get(
+            (dwi_entities["direction"][::-1], dwi_entities["session"])
+        )
+    return fieldmaps
+
+
 def write_derivative_description(bids_dir, deriv_dir):
     from keprep import __version__
 
@@ -0,0 +1,42 @@
+"""Lightweight profiling hooks for workflow construction."""
+
+from contextlib import contextmanager
+
+from keprep import config
+
+
+@contextmanager
+def profiled(name: str):
+    """
+    Profile the wrapped block when construction debugging is enabled.
+
+    When ``"construction"`` is among :attr:`config.execution.debug`
+    modes, the block runs under :class:`cProfile.Profile` and the stats
+    are dumped to ``<log_dir>/<name>.pstats`` (or the working directory
+    when no log directory is configured). Otherwise the only cost is a
+    membership check.
+
+    Parameters
+    ----------
+    name : str
+        basename for the emitted ``.pstats`` file
+    """
+    if "construction" not in config.execution.debug:
+        yield
+        return
+
+    import cProfile
+    from pathlib import Path
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        log_dir = config.execution.log_dir
+        out_dir = Path(log_dir) if log_dir else Path.cwd()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stats_file = out_dir / f"{name}.pstats"
+        profile.dump_stats(stats_file)
+        config.loggers.workflow.info("Construction profile written to %s", stats_file)
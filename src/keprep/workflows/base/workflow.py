@@ -1,7 +1,7 @@
 import os
 import sys
 import warnings
-from copy import deepcopy
+from functools import lru_cache
 from pathlib import Path
 
 from nipype.interfaces import utility as niu
@@ -15,6 +15,7 @@ from keprep.interfaces.bids import (
     write_derivative_description,
 )
 from keprep.interfaces.reports import AboutSummary, SubjectSummary
+from keprep.profiling import profiled
 from keprep.workflows.base.messages import (
     ANAT_DERIVATIVES_FAILED,
     BASE_POSTDESC,
@@ -78,17 +79,28 @@ def init_keprep_wf():
             fsdir.inputs.subjects_dir = str(config.execution.fs_subjects_dir.absolute())  # type: ignore[unreachable] # noqa: E501
 
     participants: list = config.execution.participant_label  # type: ignore[assignment]  # pylint: disable=not-an-iterable # noqa: E501
-    for subject_id in list(participants):
+    # Serialize the config only once - it is identical across subjects
+    config_payload = config.dumps().encode()
+    keprep_dir = Path(config.execution.keprep_dir)  # type: ignore[arg-type, attr-defined] # noqa: E501
+    # Deduplicate the per-subject log directories so each one is resolved
+    # and created exactly once
+    log_dirs = {
+        subject_id: keprep_dir / f"sub-{subject_id}" / "log" / config.execution.run_uuid
+        for subject_id in list(participants)
+    }
+    for log_dir in set(log_dirs.values()):
+        os.makedirs(log_dir, exist_ok=True)
+    for subject_id, log_dir in log_dirs.items():
         single_subject_wf = init_single_subject_wf(subject_id)  # type: ignore[operator]
 
-        single_subject_wf.config["execution"]["crashdump_dir"] = str(
-            Path(config.execution.keprep_dir)  # type: ignore[operator, attr-defined]
-            / f"sub-{subject_id}"
-            / "log"
-            / config.execution.run_uuid
-        )
+        single_subject_wf.config["execution"]["crashdump_dir"] = str(log_dir)
         for node in single_subject_wf._get_all_nodes():
-            node.config = deepcopy(single_subject_wf.config)
+            # The workflow config is a two-level mapping of immutable
+            # values - copying it by hand is much cheaper than deepcopy
+            node.config = {
+                key: dict(val) if isinstance(val, dict) else val
+                for key, val in single_subject_wf.config.items()
+            }
         if freesurfer:
             keprep_wf.connect(
                 fsdir,
@@ -100,14 +112,7 @@ def init_keprep_wf():
             keprep_wf.add_nodes([single_subject_wf])
 
         # Dump a copy of the config file into the log directory
-        log_dir = (
-            Path(config.execution.keprep_dir)  # type: ignore[operator, attr-defined]
-            / f"sub-{subject_id}"
-            / "log"
-            / config.execution.run_uuid
-        )
-        log_dir.mkdir(exist_ok=True, parents=True)
-        config.to_filename(log_dir / "keprep.toml")
+        (log_dir / "keprep.toml").write_bytes(config_payload)
     return keprep_wf
 
 
@@ -143,16 +148,7 @@ def init_single_subject_wf(subject_id: str):
         FreeSurfer's ``$SUBJECTS_DIR``.
 
     """
-    # pylint: disable=import-outside-toplevel,import-error
-    from niworkflows.engine.workflows import LiterateWorkflow as Workflow
-    from niworkflows.interfaces.bids import BIDSInfo
-    from niworkflows.interfaces.nilearn import NILEARN_VERSION
-    from niworkflows.utils.misc import fix_multi_T1w_source_name
-    from niworkflows.utils.spaces import Reference
-    from smriprep.workflows.anatomical import init_anat_preproc_wf
-
-    # pylint: enable=import-outside-toplevel,import-error
-    from keprep.interfaces.bids import BIDSDataGrabber, collect_data
+    from keprep.interfaces.bids import BIDSDataGrabber, collect_data, get_fieldmaps
 
     name = f"single_subject_{subject_id}_wf"
     subject_data = collect_data(
@@ -172,12 +168,10 @@ def init_single_subject_wf(subject_id: str):
         )
 
     if anat_derivatives:
-        from smriprep.utils.bids import (  # type: ignore[unreachable] # pylint: disable=import-outside-toplevel,import-error # noqa: E501
-            collect_derivatives,
+        std_spaces = tuple(  # type: ignore[unreachable]  # noqa
+            spaces.get_spaces(nonstandard=False, dim=(3,))
         )
-
-        std_spaces = spaces.get_spaces(nonstandard=False, dim=(3,))  # noqa
-        anat_derivatives = collect_derivatives(
+        anat_derivatives = _collect_anat_derivatives(
             anat_derivatives.absolute(),
             subject_id,
             std_spaces,
@@ -205,12 +199,21 @@ def init_single_subject_wf(subject_id: str):
             FutureWarning,
         )
 
+    # Defer the heavy niworkflows/smriprep imports until the fast-path
+    # validation above has passed
+    # pylint: disable=import-outside-toplevel,import-error
+    from niworkflows.engine.workflows import LiterateWorkflow as Workflow
+    from niworkflows.interfaces.nilearn import NILEARN_VERSION
+    from niworkflows.utils.misc import fix_multi_T1w_source_name
+    from smriprep.workflows.anatomical import init_anat_preproc_wf
+
+    # pylint: enable=import-outside-toplevel,import-error
+
     workflow = Workflow(name=name)
-    workflow.__desc__ = BASE_WORKFLOW_DESCRIPTION.format(
-        keprep_ver=config.environment.version,
-        nipype_ver=config.environment.nipype_version,
+    workflow.__desc__ = _base_desc(
+        config.environment.version, config.environment.nipype_version
     )
-    workflow.__postdesc__ = BASE_POSTDESC.format(nilearn_ver=NILEARN_VERSION)
+    workflow.__postdesc__ = _base_postdesc(NILEARN_VERSION)
 
     keprep_dir = str(config.execution.keprep_dir)  # type: ignore[attr-defined]
 
@@ -228,15 +231,13 @@ def init_single_subject_wf(subject_id: str):
         name="bidssrc",
     )
 
-    bids_info = pe.Node(
-        BIDSInfo(bids_dir=config.execution.bids_dir, bids_validate=False),
-        name="bids_info",
-    )
-
+    # The subject label is already known at build time - no need to
+    # re-parse it out of the T1w filename with a BIDSInfo node
     summary = pe.Node(
         SubjectSummary(
             std_spaces=spaces.get_spaces(nonstandard=False),  # type: ignore[attr-defined] # noqa: E501
             nstd_spaces=spaces.get_spaces(standard=False),  # type: ignore[attr-defined] # noqa: E501
+            subject_id=subject_id,
         ),
         name="summary",
         run_without_submitting=True,
@@ -280,63 +281,113 @@ def init_single_subject_wf(subject_id: str):
         hires=config.workflow.hires,
         skull_strip_fixed_seed=config.workflow.skull_strip_fixed_seed,
         skull_strip_mode=config.workflow.skull_strip_t1w,
-        skull_strip_template=Reference.from_string(
+        skull_strip_template=_skull_strip_template(
             config.workflow.skull_strip_template
-        )[0],
+        ),
         spaces=spaces,
         t1w=subject_data["t1w"],
         t2w=subject_data["t2w"],
         cifti_output=config.workflow.cifti_output,
     )
     anat_preproc_wf.__desc__ = f"\n\n{anat_preproc_wf.__desc__}"
+    anat_preproc_wf.inputs.inputnode.subject_id = _prefix(subject_id)
     # fmt:off
-    workflow.connect([
+    connections: list = [
         (inputnode, anat_preproc_wf, [('subjects_dir', 'inputnode.subjects_dir')]),
-        (bids_info, anat_preproc_wf, [(('subject', _prefix), 'inputnode.subject_id')]),
         (bidssrc, anat_preproc_wf, [('t1w', 'inputnode.t1w'),
                                     ('t2w', 'inputnode.t2w'),
                                     ('roi', 'inputnode.roi'),
                                     ('flair', 'inputnode.flair')]),
-        (bidssrc, bids_info, [(('t1w', fix_multi_T1w_source_name), 'in_file')]),
         (inputnode, summary, [('subjects_dir', 'subjects_dir')]),
-        (bids_info, summary, [('subject', 'subject_id')]),
         (bidssrc, summary, [('t1w', 't1w'),
                             ('t2w', 't2w'),
                             ('dwi', 'dwi')]),
-        (bidssrc, ds_report_summary, [
-            (("t1w", fix_multi_T1w_source_name), "source_file"),
-        ]),
         (summary, ds_report_summary, [("out_report", "in_file")]),
-        (bidssrc, ds_report_about, [
-            (("t1w", fix_multi_T1w_source_name), "source_file")
-        ]),
         (about, ds_report_about, [("out_report", "in_file")]),
-    ])
+    ]
+
+    if len(subject_data["t1w"]) == 1:
+        # A single T1w needs no mid-image selection - set the source file
+        # directly instead of routing it through fix_multi_T1w_source_name
+        t1w_source = subject_data["t1w"][0]
+        ds_report_summary.inputs.source_file = t1w_source
+        ds_report_about.inputs.source_file = t1w_source
+    else:
+        connections += [
+            (bidssrc, ds_report_summary, [
+                (("t1w", fix_multi_T1w_source_name), "source_file"),
+            ]),
+            (bidssrc, ds_report_about, [
+                (("t1w", fix_multi_T1w_source_name), "source_file"),
+            ]),
+        ]
+
+    if not anat_only:
+        # Resolve all DWI-fieldmap pairings in one pass over the layout
+        fieldmaps = get_fieldmaps(subject_data["dwi"], subject_data)
+        with profiled(f"sub-{subject_id}_dwi_construction"):
+            for dwi_file in subject_data["dwi"]:
+                dwi_preproc_wf = init_dwi_preproc_wf(
+                    dwi_file, subject_data, fieldmap=fieldmaps[dwi_file]
+                )
+                connections.append(
+                    (
+                        anat_preproc_wf,
+                        dwi_preproc_wf,
+                        [
+                            ("outputnode.t1w_preproc", "inputnode.t1w_preproc"),
+                            ("outputnode.t1w_mask", "inputnode.t1w_mask"),
+                        ],
+                    )
+                )
+
+    # Pay the graph-rebuild cost of ``connect`` only once
+    workflow.connect(connections)
 
     # Overwrite ``out_path_base`` of smriprep's DataSinks
     for node in workflow.list_node_names():
         if node.split(".")[-1].startswith("ds_"):
             workflow.get_node(node).interface.out_path_base = ""
 
-    if anat_only:
-        return workflow
-
-    for dwi_file in subject_data["dwi"]:
-        dwi_preproc_wf = init_dwi_preproc_wf(dwi_file, subject_data)
-        workflow.connect(
-            [
-                (
-                    anat_preproc_wf,
-                    dwi_preproc_wf,
-                    [
-                        ("outputnode.t1w_preproc", "inputnode.t1w_preproc"),
-                        ("outputnode.t1w_mask", "inputnode.t1w_mask"),
-                    ],
-                )
-            ]
-        )
     return workflow
 
 
 def _prefix(subid):
     return subid if subid.startswith("sub-") else f"sub-{subid}"
+
+
+@lru_cache(maxsize=None)
+def _base_desc(keprep_ver, nipype_ver):
+    """Render the boilerplate preamble once; versions never change mid-run."""
+    return BASE_WORKFLOW_DESCRIPTION.format(
+        keprep_ver=keprep_ver, nipype_ver=nipype_ver
+    )
+
+
+@lru_cache(maxsize=None)
+def _base_postdesc(nilearn_ver):
+    """Render the boilerplate postamble once; versions never change mid-run."""
+    return BASE_POSTDESC.format(nilearn_ver=nilearn_ver)
+
+
+@lru_cache(maxsize=None)
+def _skull_strip_template(value):
+    """Parse the skull-strip template specification only once per run."""
+    # pylint: disable=import-outside-toplevel,import-error
+    from niworkflows.utils.spaces import Reference
+
+    return Reference.from_string(value)[0]
+
+
+@lru_cache(maxsize=None)
+def _collect_anat_derivatives(anat_derivatives, subject_id, std_spaces, do_reconall):
+    """Query pre-existing anatomical derivatives, caching the tree traversal."""
+    # pylint: disable=import-outside-toplevel,import-error
+    from smriprep.utils.bids import collect_derivatives
+
+    return collect_derivatives(
+        anat_derivatives,
+        subject_id,
+        list(std_spaces),
+        do_reconall,
+    )
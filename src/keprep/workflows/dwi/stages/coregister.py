@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import nipype.pipeline.engine as pe
 from nipype.interfaces import fsl
 from nipype.interfaces import mrtrix3 as mrt
@@ -8,6 +10,23 @@ from keprep import config
 from keprep.workflows.dwi.descriptions.coregister import COREG_EPIREG, COREG_FLIRT
 
 
+@lru_cache(maxsize=None)
+def _coreg_flirt_desc(dof: int) -> str:
+    """Format the FLIRT boilerplate once per degrees-of-freedom value."""
+    return COREG_FLIRT.format(dof=dof)
+
+
+def _invert_fsl_xfm(in_file, out_file):
+    """Invert a 4x4 FSL affine in-process instead of calling convert_xfm."""
+    import os
+
+    import numpy as np
+
+    out_file = os.path.abspath(out_file)
+    np.savetxt(out_file, np.linalg.inv(np.loadtxt(in_file)), fmt="%.10f")
+    return out_file
+
+
 def init_dwi_coregister_wf(name: str = "dwi_coregister_wf") -> pe.Workflow:
     """
     Coregister DWI to T1w.
@@ -57,12 +76,15 @@ def init_dwi_coregister_wf(name: str = "dwi_coregister_wf") -> pe.Workflow:
     )
 
     convert_xfm = pe.Node(
-        fsl.ConvertXFM(
-            invert_xfm=True,
-            out_file="t1w2dwi.mat",
+        niu.Function(
+            input_names=["in_file", "out_file"],
+            output_names=["out_file"],
+            function=_invert_fsl_xfm,
         ),
         name="convert_xfm",
+        run_without_submitting=True,
     )
+    convert_xfm.inputs.out_file = "t1w2dwi.mat"
 
     apply_xfm = pe.Node(
         fsl.ApplyXFM(
@@ -71,55 +93,66 @@ def init_dwi_coregister_wf(name: str = "dwi_coregister_wf") -> pe.Workflow:
             datatype="int",
         ),
         name="apply_xfm",
+        mem_gb=1,
     )
+    # Let FSL use the allotted threads and declare them to the scheduler
+    # through ``n_procs`` so concurrent subjects do not oversubscribe CPUs
+    fsl_environ = {"OMP_NUM_THREADS": str(config.nipype.omp_nthreads)}
+
+    # Method-specific edges are concatenated with the shared edges below so
+    # that the workflow graph is (re)built by a single ``connect`` call.
+    edges: list = []
     if config.workflow.dwi2t1w_method == "epireg":
-        coreg_node = pe.Node(fsl.EpiReg(), name="epireg_node")
-        workflow.__desc__ = COREG_EPIREG
-        workflow.connect(
-            [
-                (
-                    inputnode,
-                    apply_mask,
-                    [
-                        ("t1w_preproc", "in_file"),
-                        ("t1w_mask", "mask_file"),
-                    ],
-                ),
-                (
-                    inputnode,
-                    coreg_node,
-                    [("dwi_reference", "epi"), ("t1w_preproc", "t1_head")],
-                ),
-                (
-                    coreg_node,
-                    outputnode,
-                    [
-                        ("out_file", "dwi_in_t1w"),
-                    ],
-                ),
-                (
-                    apply_mask,
-                    coreg_node,
-                    [
-                        ("out_file", "t1_brain"),
-                    ],
-                ),
-                (
-                    coreg_node,
-                    convert_xfm,
-                    [
-                        ("epi2str_mat", "in_file"),
-                    ],
-                ),
-                (
-                    coreg_node,
-                    outputnode,
-                    [
-                        ("epi2str_mat", "dwi2t1w_aff"),
-                    ],
-                ),
-            ]
+        coreg_node = pe.Node(
+            fsl.EpiReg(environ=fsl_environ),
+            name="epireg_node",
+            n_procs=config.nipype.omp_nthreads,
+            mem_gb=4,
         )
+        workflow.__desc__ = COREG_EPIREG
+        edges = [
+            (
+                inputnode,
+                apply_mask,
+                [
+                    ("t1w_preproc", "in_file"),
+                    ("t1w_mask", "mask_file"),
+                ],
+            ),
+            (
+                inputnode,
+                coreg_node,
+                [("dwi_reference", "epi"), ("t1w_preproc", "t1_head")],
+            ),
+            (
+                coreg_node,
+                outputnode,
+                [
+                    ("out_file", "dwi_in_t1w"),
+                ],
+            ),
+            (
+                apply_mask,
+                coreg_node,
+                [
+                    ("out_file", "t1_brain"),
+                ],
+            ),
+            (
+                coreg_node,
+                convert_xfm,
+                [
+                    ("epi2str_mat", "in_file"),
+                ],
+            ),
+            (
+                coreg_node,
+                outputnode,
+                [
+                    ("epi2str_mat", "dwi2t1w_aff"),
+                ],
+            ),
+        ]
     elif config.workflow.dwi2t1w_method == "flirt":
         coreg_node = pe.Node(
             fsl.FLIRT(
@@ -131,95 +164,95 @@ def init_dwi_coregister_wf(name: str = "dwi_coregister_wf") -> pe.Workflow:
                 searchr_z=[-90, 90],
                 cost="normmi",
                 bins=256,
+                environ=fsl_environ,
             ),
             name="flirt_node",
+            n_procs=config.nipype.omp_nthreads,
+            mem_gb=4,
         )
-        workflow.__desc__ = COREG_FLIRT.format(dof=config.workflow.dwi2t1w_dof)
-        workflow.connect(
-            [
-                (
-                    inputnode,
-                    apply_mask,
-                    [
-                        ("t1w_preproc", "in_file"),
-                        ("t1w_mask", "mask_file"),
-                    ],
-                ),
-                (
-                    inputnode,
-                    coreg_node,
-                    [
-                        ("dwi_reference", "in_file"),
-                    ],
-                ),
-                (
-                    coreg_node,
-                    outputnode,
-                    [
-                        ("out_file", "dwi_in_t1w"),
-                    ],
-                ),
-                (
-                    apply_mask,
-                    coreg_node,
-                    [
-                        ("out_file", "reference"),
-                    ],
-                ),
-                (
-                    coreg_node,
-                    convert_xfm,
-                    [
-                        ("out_matrix_file", "in_file"),
-                    ],
-                ),
-                (
-                    coreg_node,
-                    outputnode,
-                    [
-                        ("out_matrix_file", "dwi2t1w_aff"),
-                    ],
-                ),
-            ]
-        )
-
-    workflow.connect(
-        [
+        workflow.__desc__ = _coreg_flirt_desc(config.workflow.dwi2t1w_dof)
+        edges = [
             (
-                convert_xfm,
-                outputnode,
+                inputnode,
+                apply_mask,
                 [
-                    ("out_file", "t1w2dwi_aff"),
+                    ("t1w_preproc", "in_file"),
+                    ("t1w_mask", "mask_file"),
                 ],
             ),
             (
-                apply_mask,
+                inputnode,
+                coreg_node,
+                [
+                    ("dwi_reference", "in_file"),
+                ],
+            ),
+            (
+                coreg_node,
                 outputnode,
                 [
-                    ("out_file", "t1w_preproc_brain"),
+                    ("out_file", "dwi_in_t1w"),
                 ],
             ),
             (
-                inputnode,
-                apply_xfm,
-                [("t1w_mask", "in_file"), ("dwi_reference", "reference")],
+                apply_mask,
+                coreg_node,
+                [
+                    ("out_file", "reference"),
+                ],
             ),
             (
+                coreg_node,
                 convert_xfm,
-                apply_xfm,
                 [
-                    ("out_file", "in_matrix_file"),
+                    ("out_matrix_file", "in_file"),
                 ],
             ),
             (
-                apply_xfm,
+                coreg_node,
                 outputnode,
                 [
-                    ("out_file", "dwi_brain_mask"),
+                    ("out_matrix_file", "dwi2t1w_aff"),
                 ],
             ),
         ]
-    )
+
+    edges += [
+        (
+            convert_xfm,
+            outputnode,
+            [
+                ("out_file", "t1w2dwi_aff"),
+            ],
+        ),
+        (
+            apply_mask,
+            outputnode,
+            [
+                ("out_file", "t1w_preproc_brain"),
+            ],
+        ),
+        (
+            inputnode,
+            apply_xfm,
+            [("t1w_mask", "in_file"), ("dwi_reference", "reference")],
+        ),
+        (
+            convert_xfm,
+            apply_xfm,
+            [
+                ("out_file", "in_matrix_file"),
+            ],
+        ),
+        (
+            apply_xfm,
+            outputnode,
+            [
+                ("out_file", "dwi_brain_mask"),
+            ],
+        ),
+    ]
+    workflow.connect(edges)
     return workflow
 
 
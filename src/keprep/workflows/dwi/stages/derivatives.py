@@ -6,15 +6,65 @@ from keprep.interfaces.bids import DerivativesDataSink
 
 DWI_PREPROC_BASE_ENTITIES = dict(desc="preproc", space="dwi", datatype="dwi")
 
+# Static entity sets for the transform sinks, built once at import
+DWI2T1W_XFM_ENTITIES = {
+    "from": "dwi",
+    "to": "T1w",
+    "mode": "image",
+    "suffix": "xfm",
+    "extension": "txt",
+}
+T1W2DWI_XFM_ENTITIES = {
+    "from": "T1w",
+    "to": "dwi",
+    "mode": "image",
+    "suffix": "xfm",
+    "extension": "txt",
+}
+
 
 def _eddy_qc_dds(eddy_qc, source_file):
+    import os
     import shutil
     from pathlib import Path
 
+    def _listdir(top):
+        return {
+            os.path.relpath(os.path.join(root, fname), top): os.path.join(root, fname)
+            for root, _, files in os.walk(top)
+            for fname in files
+        }
+
+    def _materialized(src, dst):
+        """Check the destination holds the same, up-to-date file set."""
+        src_files = _listdir(src)
+        dst_files = _listdir(dst)
+        if src_files.keys() != dst_files.keys():
+            return False
+        for relpath, src_path in src_files.items():
+            src_stat = os.stat(src_path)
+            dst_stat = os.stat(dst_files[relpath])
+            if (
+                dst_stat.st_size != src_stat.st_size
+                or dst_stat.st_mtime < src_stat.st_mtime
+            ):
+                return False
+        return True
+
     destination = Path(source_file).parent / "eddy_qc"
     if destination.exists():
+        # Lazy re-run: skip the copy when the derivatives are already there
+        if _materialized(str(eddy_qc), str(destination)):
+            return
         shutil.rmtree(destination)
-    shutil.copytree(eddy_qc, destination)
+    try:
+        # Hardlink when work and output directories share a filesystem -
+        # metadata-only operations instead of full data copies
+        shutil.copytree(eddy_qc, destination, copy_function=os.link)
+    except OSError:
+        if destination.exists():
+            shutil.rmtree(destination)
+        shutil.copytree(eddy_qc, destination)
 
 
 def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
@@ -60,50 +110,32 @@ def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
         name="inputnode",
     )
 
-    ds_eddy_qc = pe.Node(
-        niu.Function(
-            input_names=["eddy_qc", "source_file"],
-            output_names=[],
-            function=_eddy_qc_dds,
-        ),
-        name="ds_eddy_qc",
-        run_without_submitting=True,
-    )
+    eddy_qc_reports = config.workflow.eddy_qc_reports
 
-    ds_eddy_qc_plot = pe.Node(
-        DerivativesDataSink(
-            base_directory=output_dir,
-            desc="eddyqc",
-            suffix="dwi",
-            datatype="figures",
-            dismiss_entities=["direction"],
-        ),
-        name="ds_eddy_qc_plot",
-        run_without_submitting=True,
-    )
+    # The reportlet sinks only differ in their ``desc`` entity - fan them
+    # out through a single MapNode so the elements can run concurrently
+    figure_fields = ["sdc_report", "coreg_report"]
+    figure_descs = ["sdc", "coreg"]
+    if eddy_qc_reports:
+        figure_fields = ["eddy_qc_plot"] + figure_fields
+        figure_descs = ["eddyqc"] + figure_descs
 
-    ds_sdc_report = pe.Node(
-        DerivativesDataSink(
-            base_directory=output_dir,
-            desc="sdc",
-            suffix="dwi",
-            datatype="figures",
-            dismiss_entities=["direction"],
-        ),
-        name="ds_report_sdc",
-        run_without_submitting=True,
+    listify_figures = pe.Node(
+        niu.Merge(len(figure_fields)),
+        name="listify_figures",
     )
-    ds_coreg_report = pe.Node(
+
+    ds_figures = pe.MapNode(
         DerivativesDataSink(
             base_directory=output_dir,
-            desc="coreg",
             suffix="dwi",
             datatype="figures",
             dismiss_entities=["direction"],
         ),
-        name="ds_coreg_report",
-        run_without_submitting=True,
+        iterfield=["in_file", "desc"],
+        name="ds_figures",
     )
+    ds_figures.inputs.desc = figure_descs
 
     ds_dwi_preproc = pe.Node(
         DerivativesDataSink(
@@ -173,13 +205,7 @@ def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
     ds_dwi2t1w_aff = pe.Node(
         DerivativesDataSink(
             base_directory=output_dir,
-            **{
-                "from": "dwi",
-                "to": "T1w",
-                "mode": "image",
-                "suffix": "xfm",
-                "extension": "txt",
-            },
+            **DWI2T1W_XFM_ENTITIES,
             dismiss_entities=["direction"],
         ),
         name="ds_dwi2t1w_aff",
@@ -189,13 +215,7 @@ def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
     ds_t1w2dwi_aff = pe.Node(
         DerivativesDataSink(
             base_directory=output_dir,
-            **{
-                "from": "T1w",
-                "to": "dwi",
-                "mode": "image",
-                "suffix": "xfm",
-                "extension": "txt",
-            },
+            **T1W2DWI_XFM_ENTITIES,
             dismiss_entities=["direction"],
         ),
         name="ds_t1w2dwi_aff",
@@ -206,28 +226,21 @@ def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
         [
             (
                 inputnode,
-                ds_eddy_qc,
-                [("eddy_qc", "eddy_qc")],
-            ),
-            (
-                ds_dwi_preproc,
-                ds_eddy_qc,
-                [("out_file", "source_file")],
-            ),
-            (
-                inputnode,
-                ds_eddy_qc_plot,
-                [("eddy_qc_plot", "in_file"), ("source_file", "source_file")],
+                listify_figures,
+                [
+                    (field, f"in{pos}")
+                    for pos, field in enumerate(figure_fields, start=1)
+                ],
             ),
             (
-                inputnode,
-                ds_sdc_report,
-                [("sdc_report", "in_file"), ("source_file", "source_file")],
+                listify_figures,
+                ds_figures,
+                [("out", "in_file")],
             ),
             (
                 inputnode,
-                ds_coreg_report,
-                [("coreg_report", "in_file"), ("source_file", "source_file")],
+                ds_figures,
+                [("source_file", "source_file")],
             ),
             (
                 inputnode,
@@ -288,4 +301,29 @@ def init_derivatives_wf(name: str = "derivatives_wf") -> pe.Workflow:
         ]
     )
 
+    if eddy_qc_reports:
+        ds_eddy_qc = pe.Node(
+            niu.Function(
+                input_names=["eddy_qc", "source_file"],
+                output_names=[],
+                function=_eddy_qc_dds,
+            ),
+            name="ds_eddy_qc",
+            run_without_submitting=True,
+        )
+        workflow.connect(
+            [
+                (
+                    inputnode,
+                    ds_eddy_qc,
+                    [("eddy_qc", "eddy_qc")],
+                ),
+                (
+                    ds_dwi_preproc,
+                    ds_eddy_qc,
+                    [("out_file", "source_file")],
+                ),
+            ]
+        )
+
     return workflow
@@ -54,7 +54,8 @@ def init_eddy_wf(name: str = "eddy_wf", fieldmap_is_4d: bool = True) -> pe.Workf
     prep_pe_pair = pe.Node(mrt.MRCat(axis=3), name="prep_pe_pair")
 
     convert_b0_to_nii = pe.Node(
-        mrt.MRConvert(out_file="b0.nii.gz"),
+        # the distorted reference only feeds the SDC reportlet - skip gzip
+        mrt.MRConvert(out_file="b0.nii"),
         name="convert_b0_to_nii",
     )
 
@@ -145,12 +146,19 @@ def init_eddy_wf(name: str = "eddy_wf", fieldmap_is_4d: bool = True) -> pe.Workf
             rpe_options="pair",
             align_seepi=True,
             nthreads=config.nipype.omp_nthreads,
-            eddyqc_all="eddyqc",
             args="-nocleanup",
         ),
         name="dwifslpreproc",
+        n_procs=config.nipype.omp_nthreads,
+        mem_gb=8,
     )
 
+    out_connections = [("out_file", "dwi_preproc")]
+    if config.workflow.eddy_qc_reports:
+        # only ask dwifslpreproc to copy the full QC tree when it is wanted
+        dwifslpreproc.inputs.eddyqc_all = "eddyqc"
+        out_connections.append(("eddyqc_all", "eddy_qc"))
+
     workflow.connect(
         [
             (
@@ -178,10 +186,7 @@ def init_eddy_wf(name: str = "eddy_wf", fieldmap_is_4d: bool = True) -> pe.Workf
             (
                 dwifslpreproc,
                 outputnode,
-                [
-                    ("out_file", "dwi_preproc"),
-                    ("eddyqc_all", "eddy_qc"),
-                ],
+                out_connections,
             ),
         ]
     )
@@ -53,17 +53,25 @@ def init_post_eddy_wf(name: str = "post_eddy_wf") -> pe.Workflow:
         name="outputnode",
     )
 
-    plot_eddy_qc_node = pe.Node(
-        niu.Function(
-            input_names=["eddy_qc", "out_file"],
-            output_names=["out_file"],
-            function=plot_eddy_qc,
-        ),
-        name="plot_eddy_qc",
-    )
-    plot_eddy_qc_node.inputs.out_file = "eddy_qc_plot.svg"
-    workflow.connect(
-        [
+    # All edges are collected here and wired through a single connect()
+    # call at the end of the build
+    connections = []
+
+    if config.workflow.eddy_qc_reports:
+        plot_eddy_qc_node = pe.Node(
+            niu.Function(
+                input_names=["eddy_qc", "out_file"],
+                output_names=["out_file"],
+                function=plot_eddy_qc,
+            ),
+            name="plot_eddy_qc",
+            n_procs=1,
+            mem_gb=0.5,
+        )
+        # SVG is the only raster-free extension the figures datasink
+        # pattern admits; Agg path simplification keeps it compact
+        plot_eddy_qc_node.inputs.out_file = "eddy_qc_plot.svg"
+        connections += [
             (
                 inputnode,
                 plot_eddy_qc_node,
@@ -79,7 +87,6 @@ def init_post_eddy_wf(name: str = "post_eddy_wf") -> pe.Workflow:
                 ],
             ),
         ]
-    )
 
     mrconvert_dwi = pe.Node(
         MRConvert(
@@ -91,109 +98,121 @@ def init_post_eddy_wf(name: str = "post_eddy_wf") -> pe.Workflow:
             nthreads=config.nipype.omp_nthreads,
         ),
         name="mrconvert_dwi",
+        n_procs=config.nipype.omp_nthreads,
+        mem_gb=2,
     )
+    b0_extractor = init_extract_b0_wf()
+
     if config.workflow.dwi_no_biascorr:
-        workflow.connect(
-            [
-                (
-                    inputnode,
-                    mrconvert_dwi,
-                    [
-                        ("dwi_preproc", "in_file"),
-                    ],
-                ),
-                (
-                    inputnode,
-                    outputnode,
-                    [("dwi_preproc", "dwi_mif")],
-                ),
-            ]
-        )
+        connections += [
+            (
+                inputnode,
+                mrconvert_dwi,
+                [
+                    ("dwi_preproc", "in_file"),
+                ],
+            ),
+            (
+                inputnode,
+                b0_extractor,
+                [
+                    ("dwi_preproc", "inputnode.dwi_file"),
+                ],
+            ),
+            (
+                inputnode,
+                outputnode,
+                [("dwi_preproc", "dwi_mif")],
+            ),
+        ]
     else:
         bias_correct = pe.Node(
             mrt.DWIBiasCorrect(
                 out_file="bias_corrected.mif",
                 use_ants=True,
                 nthreads=config.nipype.omp_nthreads,
+                # Cap the ANTs/ITK thread pools at the same budget so the
+                # N4 call does not oversubscribe on top of MRtrix's threads
+                environ={
+                    "ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS": str(
+                        config.nipype.omp_nthreads
+                    ),
+                    "OMP_NUM_THREADS": str(config.nipype.omp_nthreads),
+                },
             ),
             name="bias_correct",
+            n_procs=config.nipype.omp_nthreads,
+            mem_gb=6,
         )
-        workflow.connect(
-            [
-                (
-                    inputnode,
-                    bias_correct,
-                    [
-                        ("dwi_preproc", "in_file"),
-                    ],
-                ),
-                (
-                    bias_correct,
-                    mrconvert_dwi,
-                    [
-                        ("out_file", "in_file"),
-                    ],
-                ),
-                (
-                    bias_correct,
-                    outputnode,
-                    [
-                        ("out_file", "dwi_mif"),
-                    ],
-                ),
-            ]
-        )
-
-    workflow.connect(
-        [
+        connections += [
             (
-                mrconvert_dwi,
-                outputnode,
+                inputnode,
+                bias_correct,
                 [
-                    ("out_file", "dwi_preproc"),
-                    ("out_mrtrix_grad", "dwi_grad"),
-                    ("out_bval", "dwi_bval"),
-                    ("out_bvec", "dwi_bvec"),
-                    ("json_export", "dwi_json"),
+                    ("dwi_preproc", "in_file"),
                 ],
             ),
-        ]
-    )
-
-    b0_extractor = init_extract_b0_wf()
-    mrconvert_dwiref = pe.Node(
-        MRConvert(
-            out_file="dwi_reference.nii.gz",
-            json_export="dwi_reference.json",
-            nthreads=config.nipype.omp_nthreads,
-        ),
-        name="mrconvert_dwiref",
-    )
-    workflow.connect(
-        [
             (
                 bias_correct,
-                b0_extractor,
+                mrconvert_dwi,
                 [
-                    ("out_file", "inputnode.dwi_file"),
+                    ("out_file", "in_file"),
                 ],
             ),
             (
+                bias_correct,
                 b0_extractor,
-                mrconvert_dwiref,
                 [
-                    ("outputnode.dwi_reference", "in_file"),
+                    ("out_file", "inputnode.dwi_file"),
                 ],
             ),
             (
-                mrconvert_dwiref,
+                bias_correct,
                 outputnode,
                 [
-                    ("out_file", "dwi_reference"),
-                    ("json_export", "dwi_reference_json"),
+                    ("out_file", "dwi_mif"),
                 ],
             ),
         ]
+
+    mrconvert_dwiref = pe.Node(
+        MRConvert(
+            out_file="dwi_reference.nii.gz",
+            json_export="dwi_reference.json",
+            nthreads=config.nipype.omp_nthreads,
+        ),
+        name="mrconvert_dwiref",
+        n_procs=1,
+        mem_gb=0.5,
     )
+    connections += [
+        (
+            mrconvert_dwi,
+            outputnode,
+            [
+                ("out_file", "dwi_preproc"),
+                ("out_mrtrix_grad", "dwi_grad"),
+                ("out_bval", "dwi_bval"),
+                ("out_bvec", "dwi_bvec"),
+                ("json_export", "dwi_json"),
+            ],
+        ),
+        (
+            b0_extractor,
+            mrconvert_dwiref,
+            [
+                ("outputnode.dwi_reference", "in_file"),
+            ],
+        ),
+        (
+            mrconvert_dwiref,
+            outputnode,
+            [
+                ("out_file", "dwi_reference"),
+                ("json_export", "dwi_reference_json"),
+            ],
+        ),
+    ]
+    workflow.connect(connections)
 
     return workflow
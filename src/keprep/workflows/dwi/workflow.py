@@ -1,9 +1,15 @@
+import os
+from functools import lru_cache
 from pathlib import Path
 
 from bids import BIDSLayout
+from nipype.interfaces import mrtrix3 as mrt
 from nipype.interfaces import utility as niu
 from nipype.pipeline import engine as pe
 from niworkflows.engine.workflows import LiterateWorkflow as Workflow
+from niworkflows.interfaces.reportlets.registration import (
+    SimpleBeforeAfterRPT as SimpleBeforeAfter,
+)
 
 from keprep import config
 from keprep.interfaces.bids import get_fieldmap
@@ -21,10 +27,14 @@ from keprep.workflows.dwi.stages.post_eddy import init_post_eddy_wf
 from keprep.workflows.dwi.utils import calculate_denoise_window, read_field_from_json
 
 
+@lru_cache(maxsize=None)
 def fieldmap_is_4d(fieldmap_file: str | Path) -> bool:
     """
     Check if the fieldmap is 4D.
 
+    The result is cached - DWI runs of the same session share their
+    fieldmap, so the header is only inspected once per file.
+
     Parameters
     ----------
     fieldmap_file : Union[str,Path]
@@ -41,7 +51,44 @@ def fieldmap_is_4d(fieldmap_file: str | Path) -> bool:
     return fieldmap_img.ndim == 4  # type: ignore[attr-defined]
 
 
-def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
+@lru_cache(maxsize=None)
+def _summary_settings(hmc_model: str, denoise_method: str, dwi2t1w_dof: int) -> dict:
+    """
+    Collect the config-derived DiffusionSummary settings.
+
+    These are identical for every DWI run of a batch; keying the cache
+    on the config values themselves keeps reloaded configs in the same
+    interpreter from picking up stale settings.
+    """
+    return {
+        "distortion_correction": "TOPUP",
+        "hmc_model": hmc_model,
+        "denoise_method": denoise_method,
+        "b0_to_t1w_transform": "Rigid" if dwi2t1w_dof == 6 else "Affine",
+    }
+
+
+@lru_cache(maxsize=None)
+def _sidecar_files(file_path: str) -> tuple[str, str, str]:
+    """
+    Query the BIDS layout for a file's bvec, bval and JSON sidecars.
+
+    Results are memoized per path - fieldmaps are shared between DWI
+    runs, so repeated workflow builds skip the layout traversal.
+    """
+    layout: BIDSLayout = config.execution.layout  # type: ignore[assignment]
+    return (
+        layout.get_bvec(file_path),
+        layout.get_bval(file_path),
+        layout.get_nearest(file_path, extension="json"),
+    )
+
+
+def init_dwi_preproc_wf(
+    dwi_file: str | Path,
+    subject_data: dict,
+    fieldmap: str | Path | None = None,
+):
     """
     Build the dwi preprocessing workflow.
 
@@ -49,53 +96,41 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
     ----------
     dwi_file : Union[str,Path]
         path to DWI file
+    subject_data : dict
+        subject data
+    fieldmap : Union[str,Path,None], optional
+        pre-resolved fieldmap for this DWI file; looked up in
+        ``subject_data`` when not provided
     """
-    from nipype.interfaces import mrtrix3 as mrt
-    from niworkflows.interfaces.reportlets.registration import (
-        SimpleBeforeAfterRPT as SimpleBeforeAfter,
-    )
-
-    layout: BIDSLayout = config.execution.layout
     config.loggers.workflow.debug(
         "Creating DWI preprocessing workflow for <%s>" % dwi_file
     )
-    fieldmap = get_fieldmap(dwi_file=dwi_file, subject_data=subject_data)
+    if fieldmap is None:
+        fieldmap = get_fieldmap(dwi_file=dwi_file, subject_data=subject_data)
     if not fieldmap:  # currently, fieldmap in necessary
         raise FileNotFoundError(f"No fieldmap found for <{dwi_file}>")
 
     # Build workflow
     workflow = Workflow(name=_get_wf_name(dwi_file))
 
+    # The inputnode only carries the dynamic anatomical inputs; the DWI
+    # and fieldmap paths are constants known at build time and are set
+    # directly on their consumers, sparing the pass-through executions
     inputnode = pe.Node(
         niu.IdentityInterface(
             fields=[
-                # DWI related
-                "dwi_file",
-                "dwi_bvec",
-                "dwi_bval",
-                "dwi_json",
-                # Fieldmap related
-                "fmap_file",
-                "fmap_bvec",
-                "fmap_bval",
-                "fmap_json",
-                # Anatomical
                 "t1w_preproc",
                 "t1w_mask",
             ]
         ),
         name="inputnode",
     )
-    # Set up DWI
-    inputnode.inputs.dwi_file = Path(dwi_file)
-    inputnode.inputs.dwi_bvec = Path(layout.get_bvec(dwi_file))
-    inputnode.inputs.dwi_bval = Path(layout.get_bval(dwi_file))
-    inputnode.inputs.dwi_json = Path(layout.get_nearest(dwi_file, extension="json"))
-    # Set up fieldmap
-    inputnode.inputs.fmap_file = Path(fieldmap)
-    inputnode.inputs.fmap_bvec = Path(layout.get_bvec(fieldmap))
-    inputnode.inputs.fmap_bval = Path(layout.get_bval(fieldmap))
-    inputnode.inputs.fmap_json = Path(layout.get_nearest(fieldmap, extension="json"))
+    # The layout returns plain path strings, which the downstream
+    # interfaces accept as-is, so no Path objects are allocated here
+    dwi_file = str(dwi_file)
+    fieldmap = str(fieldmap)
+    dwi_bvec, dwi_bval, dwi_json = _sidecar_files(dwi_file)
+    fmap_bvec, fmap_bval, fmap_json = _sidecar_files(fieldmap)
 
     # check if fieldmap is 4D
     fmap_is_4d = fieldmap_is_4d(fieldmap)
@@ -107,44 +142,43 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
         name="outputnode",
     )
 
-    if (
-        config.workflow.denoise_method == "dwidenoise"
-        and config.workflow.dwi_denoise_window == "auto"
-    ):
-        dwi_denoise_window = calculate_denoise_window(dwi_file)  # type: ignore[arg-type] # noqa: E501
+    # MP-PCA denoising (and its window calculation) only happens when
+    # requested - otherwise the converted DWI goes straight to eddy
+    run_denoise = config.workflow.denoise_method == "dwidenoise"
+    dwi_denoise_window: int | str = "N/A"
+    if run_denoise:
+        dwi_denoise_window = config.workflow.dwi_denoise_window
+        if dwi_denoise_window == "auto":
+            dwi_denoise_window = calculate_denoise_window(dwi_file)
     n_dwis = len(subject_data["dwi"])
     desc = (
         DIFFUSION_WORKFLOW_DESCRIPTION_MULTI_SESSIONS
         if n_dwis > 1
         else DIFFUSION_WORKFLOW_DESCRIPTION_SINGLE_SESSION
     )
-    workflow.__desc__ = desc.format(n_dwi=n_dwis) + DENOISING.format(
-        b0_threshold=config.workflow.b0_threshold, denoise_window=dwi_denoise_window
-    )
+    workflow.__desc__ = desc.format(n_dwi=n_dwis)
+    if run_denoise:
+        workflow.__desc__ += DENOISING.format(
+            b0_threshold=config.workflow.b0_threshold,
+            denoise_window=dwi_denoise_window,
+        )
 
-    bo_to_t1w = "Rigid" if config.workflow.dwi2t1w_dof == 6 else "Affine"
     summary = pe.Node(
         DiffusionSummary(
-            distortion_correction="TOPUP",
-            hmc_model=config.workflow.hmc_model,
-            b0_to_t1w_transform=bo_to_t1w,
-            denoise_method=config.workflow.denoise_method,
             dwi_denoise_window=dwi_denoise_window,
+            # the sidecar is known here - read the phase encoding at
+            # build time instead of through a Function node
+            pe_direction=read_field_from_json(dwi_json, "PhaseEncodingDirection"),
+            **_summary_settings(
+                config.workflow.hmc_model,
+                config.workflow.denoise_method,
+                config.workflow.dwi2t1w_dof,
+            ),
         ),
         name="summary",
         run_without_submitting=True,
     )
 
-    read_pe_direction = pe.Node(
-        niu.Function(
-            input_names=["json_file", "field"],
-            output_names=["pe_dir"],
-            function=read_field_from_json,
-        ),
-        name="read_pe_direction",
-    )
-    read_pe_direction.inputs.field = "PhaseEncodingDirection"
-
     # Reporting
     ds_report_summary = pe.Node(
         DerivativesDataSink(
@@ -158,88 +192,66 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
         name="ds_report_summary",
         run_without_submitting=True,
     )
-    workflow.connect(
-        [
-            (
-                inputnode,
-                read_pe_direction,
-                [("dwi_json", "json_file")],
-            ),
-            (
-                read_pe_direction,
-                summary,
-                [("pe_dir", "pe_direction")],
-            ),
-            (
-                summary,
-                ds_report_summary,
-                [("out_report", "in_file")],
-            ),
-        ]
-    )
 
+    # Edges are collected throughout the build and wired through a
+    # single connect() call before returning
+    connections = [
+        (
+            summary,
+            ds_report_summary,
+            [("out_report", "in_file")],
+        ),
+    ]
+
+    # Both conversions share the same spec except for the output name;
+    # their inputs are build-time constants, assigned directly
+    mifconv_kwargs = {"nthreads": config.nipype.omp_nthreads}
     dwi_conversion_to_mif_node = pe.Node(
         interface=mrt.MRConvert(
-            out_file="dwi.mif", nthreads=config.nipype.omp_nthreads
+            in_file=dwi_file,
+            in_bvec=dwi_bvec,
+            in_bval=dwi_bval,
+            json_import=dwi_json,
+            out_file="dwi.mif",
+            **mifconv_kwargs,
         ),
         name="dwi_mifconv",
+        mem_gb=2,
     )
     fmap_conversion_to_mif_node = pe.Node(
         interface=mrt.MRConvert(
-            out_file="fmap.mif", nthreads=config.nipype.omp_nthreads
+            in_file=fieldmap,
+            in_bvec=fmap_bvec,
+            in_bval=fmap_bval,
+            json_import=fmap_json,
+            out_file="fmap.mif",
+            **mifconv_kwargs,
         ),
         name="fmap_mifconv",
+        mem_gb=1,
     )
 
-    workflow.connect(
-        [
-            (
-                inputnode,
-                dwi_conversion_to_mif_node,
-                [
-                    ("dwi_file", "in_file"),
-                    ("dwi_bvec", "in_bvec"),
-                    ("dwi_bval", "in_bval"),
-                    ("dwi_json", "json_import"),
-                ],
-            ),
-            (
-                inputnode,
-                fmap_conversion_to_mif_node,
-                [
-                    ("fmap_file", "in_file"),
-                    ("fmap_bvec", "in_bvec"),
-                    ("fmap_bval", "in_bval"),
-                    ("fmap_json", "json_import"),
-                ],
+    eddy_wf = init_eddy_wf(fieldmap_is_4d=fmap_is_4d)
+    if run_denoise:
+        # Denoise DWI using MP-PCA
+        dwi_denoise_node = pe.Node(
+            interface=mrt.DWIDenoise(
+                out_file="dwi_denoised.mif",
+                extent=(dwi_denoise_window,) * 3,
+                # intermediate output - skip gzip
+                noise="noise.nii",
+                nthreads=config.nipype.omp_nthreads,
             ),
-        ]
-    )
-
-    # Denoise DWI using MP-PCA
-    dwi_denoise_node = pe.Node(
-        interface=mrt.DWIDenoise(
-            out_file="dwi_denoised.mif",
-            extent=(dwi_denoise_window, dwi_denoise_window, dwi_denoise_window),
-            noise="noise.nii.gz",
-            nthreads=config.nipype.omp_nthreads,
-        ),
-        name="dwi_denoise",
-    )
-    workflow.connect(
-        [
+            name="dwi_denoise",
+            n_procs=config.nipype.omp_nthreads,
+            mem_gb=6,
+        )
+        connections += [
             (
                 dwi_conversion_to_mif_node,
                 dwi_denoise_node,
                 [("out_file", "in_file")],
             ),
-        ]
-    )
-
-    eddy_wf = init_eddy_wf(fieldmap_is_4d=fmap_is_4d)
-    workflow.connect(
-        [
-            (inputnode, eddy_wf, [("dwi_json", "inputnode.dwi_json")]),
             (
                 dwi_denoise_node,
                 eddy_wf,
@@ -247,30 +259,41 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
                     ("out_file", "inputnode.dwi_file"),
                 ],
             ),
+        ]
+    else:
+        connections += [
             (
-                fmap_conversion_to_mif_node,
+                dwi_conversion_to_mif_node,
                 eddy_wf,
                 [
-                    ("out_file", "inputnode.fmap_file"),
+                    ("out_file", "inputnode.dwi_file"),
                 ],
             ),
         ]
-    )
+
+    eddy_wf.inputs.inputnode.dwi_json = dwi_json
+    connections += [
+        (
+            fmap_conversion_to_mif_node,
+            eddy_wf,
+            [
+                ("out_file", "inputnode.fmap_file"),
+            ],
+        ),
+    ]
 
     post_eddy = init_post_eddy_wf()
 
-    workflow.connect(
-        [
-            (
-                eddy_wf,
-                post_eddy,
-                [
-                    ("outputnode.dwi_preproc", "inputnode.dwi_preproc"),
-                    ("outputnode.eddy_qc", "inputnode.eddy_qc"),
-                ],
-            ),
-        ]
-    )
+    eddy_to_post_eddy = [("outputnode.dwi_preproc", "inputnode.dwi_preproc")]
+    if config.workflow.eddy_qc_reports:
+        eddy_to_post_eddy.append(("outputnode.eddy_qc", "inputnode.eddy_qc"))
+    connections += [
+        (
+            eddy_wf,
+            post_eddy,
+            eddy_to_post_eddy,
+        ),
+    ]
 
     sdc_report = pe.Node(
         SimpleBeforeAfter(
@@ -284,39 +307,37 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
 
     coreg_wf = init_dwi_coregister_wf()
 
-    workflow.connect(
-        [
-            (
-                eddy_wf,
-                sdc_report,
-                [
-                    ("outputnode.dwi_reference_distorted", "before"),
-                ],
-            ),
-            (
-                post_eddy,
-                sdc_report,
-                [
-                    ("outputnode.dwi_reference", "after"),
-                ],
-            ),
-            (
-                post_eddy,
-                coreg_wf,
-                [
-                    ("outputnode.dwi_reference", "inputnode.dwi_reference"),
-                ],
-            ),
-            (
-                inputnode,
-                coreg_wf,
-                [
-                    ("t1w_preproc", "inputnode.t1w_preproc"),
-                    ("t1w_mask", "inputnode.t1w_mask"),
-                ],
-            ),
-        ]
-    )
+    connections += [
+        (
+            eddy_wf,
+            sdc_report,
+            [
+                ("outputnode.dwi_reference_distorted", "before"),
+            ],
+        ),
+        (
+            post_eddy,
+            sdc_report,
+            [
+                ("outputnode.dwi_reference", "after"),
+            ],
+        ),
+        (
+            post_eddy,
+            coreg_wf,
+            [
+                ("outputnode.dwi_reference", "inputnode.dwi_reference"),
+            ],
+        ),
+        (
+            inputnode,
+            coreg_wf,
+            [
+                ("t1w_preproc", "inputnode.t1w_preproc"),
+                ("t1w_mask", "inputnode.t1w_mask"),
+            ],
+        ),
+    ]
 
     coreg_report = pe.Node(
         SimpleBeforeAfter(
@@ -327,84 +348,83 @@ def init_dwi_preproc_wf(dwi_file: str | Path, subject_data: dict):
         name="coreg_report",
         mem_gb=0.1,
     )
-    workflow.connect(
-        [
-            (
-                inputnode,
-                coreg_report,
-                [
-                    ("t1w_preproc", "before"),
-                ],
-            ),
-            (
-                coreg_wf,
-                coreg_report,
-                [
-                    ("outputnode.dwi_in_t1w", "after"),
-                ],
-            ),
-        ]
-    )
+    connections += [
+        (
+            inputnode,
+            coreg_report,
+            [
+                ("t1w_preproc", "before"),
+            ],
+        ),
+        (
+            coreg_wf,
+            coreg_report,
+            [
+                ("outputnode.dwi_in_t1w", "after"),
+            ],
+        ),
+    ]
     ds_workflow = init_derivatives_wf()
 
-    workflow.connect(
-        [
-            (
-                inputnode,
-                ds_workflow,
-                [
-                    ("dwi_file", "inputnode.source_file"),
-                ],
-            ),
+    post_eddy_to_ds = [
+        ("outputnode.dwi_preproc", "inputnode.dwi_preproc"),
+        ("outputnode.dwi_grad", "inputnode.dwi_grad"),
+        ("outputnode.dwi_bvec", "inputnode.dwi_bvec"),
+        ("outputnode.dwi_bval", "inputnode.dwi_bval"),
+        ("outputnode.dwi_json", "inputnode.dwi_json"),
+        ("outputnode.dwi_reference", "inputnode.dwi_reference"),
+        (
+            "outputnode.dwi_reference_json",
+            "inputnode.dwi_reference_json",
+        ),
+    ]
+    ds_workflow.inputs.inputnode.source_file = dwi_file
+    if config.workflow.eddy_qc_reports:
+        post_eddy_to_ds.append(("outputnode.eddy_qc_plot", "inputnode.eddy_qc_plot"))
+        connections.append(
             (
                 eddy_wf,
                 ds_workflow,
                 [
                     ("outputnode.eddy_qc", "inputnode.eddy_qc"),
                 ],
-            ),
-            (
-                post_eddy,
-                ds_workflow,
-                [
-                    ("outputnode.dwi_preproc", "inputnode.dwi_preproc"),
-                    ("outputnode.dwi_grad", "inputnode.dwi_grad"),
-                    ("outputnode.dwi_bvec", "inputnode.dwi_bvec"),
-                    ("outputnode.dwi_bval", "inputnode.dwi_bval"),
-                    ("outputnode.dwi_json", "inputnode.dwi_json"),
-                    ("outputnode.dwi_reference", "inputnode.dwi_reference"),
-                    (
-                        "outputnode.dwi_reference_json",
-                        "inputnode.dwi_reference_json",
-                    ),
-                    ("outputnode.eddy_qc_plot", "inputnode.eddy_qc_plot"),
-                ],
-            ),
-            (
-                coreg_wf,
-                ds_workflow,
-                [
-                    ("outputnode.dwi_brain_mask", "inputnode.dwi_brain_mask"),
-                    ("outputnode.dwi2t1w_aff", "inputnode.dwi2t1w_aff"),
-                    ("outputnode.t1w2dwi_aff", "inputnode.t1w2dwi_aff"),
-                ],
-            ),
-            (
-                sdc_report,
-                ds_workflow,
-                [("out_report", "inputnode.sdc_report")],
-            ),
-            (
-                coreg_report,
-                ds_workflow,
-                [("out_report", "inputnode.coreg_report")],
-            ),
-        ]
-    )
+            )
+        )
+    connections += [
+        (
+            post_eddy,
+            ds_workflow,
+            post_eddy_to_ds,
+        ),
+        (
+            coreg_wf,
+            ds_workflow,
+            [
+                ("outputnode.dwi_brain_mask", "inputnode.dwi_brain_mask"),
+                ("outputnode.dwi2t1w_aff", "inputnode.dwi2t1w_aff"),
+                ("outputnode.t1w2dwi_aff", "inputnode.t1w2dwi_aff"),
+            ],
+        ),
+        (
+            sdc_report,
+            ds_workflow,
+            [("out_report", "inputnode.sdc_report")],
+        ),
+        (
+            coreg_report,
+            ds_workflow,
+            [("out_report", "inputnode.coreg_report")],
+        ),
+    ]
+    workflow.connect(connections)
 
     return workflow
 
 
+# Single-pass sanitization table for workflow names
+_WF_NAME_TABLE = str.maketrans({".": "_", " ": "", "-": "_"})
+
+
 def _get_wf_name(filename):
     """
     Derive the workflow name for supplied DWI file.
@@ -418,8 +438,6 @@ def _get_wf_name(filename):
     'dwi_preproc_dir_RL_run_01_echo_1_wf'
 
     """
-    from pathlib import Path
-
-    fname = Path(filename).name.rpartition(".nii")[0].replace("_dwi", "_wf")
+    fname = os.path.basename(filename).rpartition(".nii")[0].replace("_dwi", "_wf")
     fname_nosub = "_".join(fname.split("_")[1:])
-    return f"dwi_preproc_{fname_nosub.replace('.', '_').replace(' ', '').replace('-', '_')}"  # noqa: E501
+    return f"dwi_preproc_{fname_nosub.translate(_WF_NAME_TABLE)}"
@@ -97,7 +97,9 @@ def test_to_filename_load(bids_dataset):
         "plugin": "Linear",
     }
 
-    with tempfile.TemporaryDirectory() as tmpdirname:
+    # KEPREP_TEST_TMPDIR lets CI point scratch space at a tmpfs mount
+    # (e.g. /dev/shm) for in-memory I/O; defaults to the system tempdir
+    with tempfile.TemporaryDirectory(dir=os.getenv("KEPREP_TEST_TMPDIR")) as tmpdirname:
         config_file = Path(tmpdirname) / "test_config.toml"
         config.from_dict(settings, init=False)
         config.to_filename(config_file)